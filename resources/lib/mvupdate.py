@@ -42,6 +42,7 @@ class Settings(object):
         self.groupshows = False
         self.updmode = 3
         self.updinterval = args.intervall
+        self.updxzthreads = 0
 
     @staticmethod
     def reload():
@@ -12,7 +12,7 @@ import os
 import re
 import sys
 import stat
-import string
+import threading
 from contextlib import closing
 from codecs import open
 
@@ -21,9 +21,11 @@ try:
     # Python 3.x
     from urllib.parse import urlencode
     from urllib.request import urlopen
+    from queue import Queue
 except ImportError:
     from urllib import urlencode
     from urllib2 import urlopen
+    from Queue import Queue
 
 from contextlib import closing
 from resources.lib.exceptions import ExitRequested
@@ -38,6 +40,17 @@ except ImportError:
 
 PY2 = sys.version_info[0] == 2
 
+# runs of characters not allowed in search strings and filenames
+_SEARCH_STRIP = re.compile(u'[^A-Za-z0-9 _#-]+')
+_FILENAME_STRIP = re.compile(
+    u'[^A-Za-z0-9 _#äöüÄÖÜßáàâéèêíìîóòôúùûÁÀÉÈÍÌÓÒÚÙçÇœ-]+')
+
+# results of `make_duration()`
+_DURATIONS = {}
+
+# full pathnames of executables found by `_find_binary()`
+_BINARIES = {}
+
 def py2_encode(s, encoding='utf-8'):
    """
    Encode Python 2 ``unicode`` to ``str``
@@ -171,10 +184,7 @@ def find_gzip():
     Return the full pathname to the gzip decompressor
     executable
     """
-    for gzbin in ['/bin/gzip', '/usr/bin/gzip', '/usr/local/bin/gzip', '/system/bin/gzip']:
-        if file_exists(gzbin):
-            return gzbin
-    return None
+    return _find_binary('gzip')
 
 
 def find_xz():
@@ -182,10 +192,18 @@ def find_xz():
     Return the full pathname to the xz decompressor
     executable
     """
-    for xzbin in ['/bin/xz', '/usr/bin/xz', '/usr/local/bin/xz', '/system/bin/xz']:
-        if file_exists(xzbin):
-            return xzbin
-    return None
+    return _find_binary('xz')
+
+
+def _find_binary(name):
+    # the result is looked up only once per process
+    if name not in _BINARIES:
+        _BINARIES[name] = None
+        for path in ['/bin/', '/usr/bin/', '/usr/local/bin/', '/system/bin/']:
+            if file_exists(path + name):
+                _BINARIES[name] = path + name
+                break
+    return _BINARIES[name]
 
 
 def make_search_string(val):
@@ -194,8 +212,7 @@ def make_search_string(val):
     containing only a well defined set of characters
     for a simplified search
     """
-    cset = string.ascii_letters + string.digits + ' _-#'
-    search = ''.join([c for c in val if c in cset])
+    search = _SEARCH_STRIP.sub('', py2_decode(val))
     return search.upper().strip()
 
 
@@ -211,10 +228,16 @@ def make_duration(val):
         return None
     elif val is None:
         return None
-    parts = val.split(':')
-    if len(parts) != 3:
-        return None
-    return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+    # the number of distinct durations is small compared
+    # to the number of films, so remember the results
+    duration = _DURATIONS.get(val)
+    if duration is None:
+        parts = val.split(':')
+        if len(parts) != 3:
+            return None
+        duration = int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+        _DURATIONS[val] = duration
+    return duration
 
 
 def cleanup_filename(val):
@@ -225,13 +248,11 @@ def cleanup_filename(val):
     Args:
         val(str): input string
     """
-    cset = string.ascii_letters + string.digits + \
-        u' _-#äöüÄÖÜßáàâéèêíìîóòôúùûÁÀÉÈÍÌÓÒÚÙçÇœ'
-    search = ''.join([c for c in val if c in cset])
+    search = _FILENAME_STRIP.sub('', py2_decode(val))
     return search.strip()
 
 
-def url_retrieve(url, filename, reporthook, chunk_size=8192, aborthook=None):
+def url_retrieve(url, filename, reporthook, chunk_size=131072, aborthook=None, decompressor=None):
     """
     Copy a network object denoted by a URL to a local file
 
@@ -242,23 +263,28 @@ def url_retrieve(url, filename, reporthook, chunk_size=8192, aborthook=None):
 
         reporthook(function): a hook function that will be called once on
             establishment of the network connection and once after each
-            block read thereafter. The hook will be passed three arguments;
+            megabyte read thereafter. The hook will be passed three arguments;
             a count of blocks transferred so far, a block size in bytes,
             and the total size of the file.
 
         chunk_size(int, optional): size of the chunks read by the function.
-            Default is 8192
+            Default is 131072
 
         aborthook(function, optional): a hook function that will be called
             once on establishment of the network connection and once after
             each block read thereafter. If specified the operation will be
             aborted if the hook function returns `True`
+
+        decompressor(callable, optional): a factory for decompressor
+            objects like `lzma.LZMADecompressor`. If specified the received
+            data will be decompressed on the fly before it is written to
+            the file. Concatenated streams and stream padding are supported
     """
     with closing(urlopen(url, timeout = 10)) as src, closing(open(filename, 'wb')) as dst:
-        _chunked_url_copier(src, dst, reporthook, chunk_size, aborthook)
+        _chunked_url_copier(src, dst, reporthook, chunk_size, aborthook, decompressor)
 
 
-def url_retrieve_vfs(url, filename, reporthook, chunk_size=8192, aborthook=None):
+def url_retrieve_vfs(url, filename, reporthook, chunk_size=131072, aborthook=None, decompressor=None):
     """
     Copy a network object denoted by a URL to a local file using
     Kodi's VFS functions
@@ -270,20 +296,25 @@ def url_retrieve_vfs(url, filename, reporthook, chunk_size=8192, aborthook=None)
 
         reporthook(function): a hook function that will be called once on
             establishment of the network connection and once after each
-            block read thereafter. The hook will be passed three arguments;
+            megabyte read thereafter. The hook will be passed three arguments;
             a count of blocks transferred so far, a block size in bytes,
             and the total size of the file.
 
         chunk_size(int, optional): size of the chunks read by the function.
-            Default is 8192
+            Default is 131072
 
         aborthook(function, optional): a hook function that will be called
             once on establishment of the network connection and once after
             each block read thereafter. If specified the operation will be
             aborted if the hook function returns `True`
+
+        decompressor(callable, optional): a factory for decompressor
+            objects like `lzma.LZMADecompressor`. If specified the received
+            data will be decompressed on the fly before it is written to
+            the file. Concatenated streams and stream padding are supported
     """
     with closing(urlopen(url, timeout = 10)) as src, closing(xbmcvfs.File(filename, 'wb')) as dst:
-        _chunked_url_copier(src, dst, reporthook, chunk_size, aborthook)
+        _chunked_url_copier(src, dst, reporthook, chunk_size, aborthook, decompressor)
 
 
 def build_url(query):
@@ -295,24 +326,142 @@ def build_url(query):
     """
     return sys.argv[0] + '?' + urlencode(query)
 
-def _chunked_url_copier(src, dst, reporthook, chunk_size, aborthook):
+def _chunked_url_copier(src, dst, reporthook, chunk_size, aborthook, decompressor):
     aborthook = aborthook if aborthook is not None else lambda: False
     total_size = int(
         src.info().get('Content-Length').strip()
     ) if src.info() and src.info().get('Content-Length') else 0
     total_chunks = 0
+    # do not call the report hook more often than once per megabyte
+    report_chunks = max(1, 1048576 // chunk_size)
+    if decompressor is not None:
+        # decompress in a separate thread while receiving the next chunks
+        dst = _DecompressingWriter(dst, decompressor)
 
-    while not aborthook():
-        reporthook(total_chunks, chunk_size, total_size)
-        byteStringchunk = src.read(chunk_size)
-        if not byteStringchunk:
-            # operation has finished
-            return
-        dst.write(bytearray(byteStringchunk))
-        total_chunks += 1
+    try:
+        while not aborthook():
+            if total_chunks % report_chunks == 0:
+                reporthook(total_chunks, chunk_size, total_size)
+            byteStringchunk = src.read(chunk_size)
+            if not byteStringchunk:
+                # operation has finished
+                if decompressor is not None:
+                    dst.finish()
+                return
+            dst.write(bytearray(byteStringchunk))
+            total_chunks += 1
+    finally:
+        if decompressor is not None:
+            dst.cancel()
     # abort requested
     raise ExitRequested('Reception interrupted.')
 
+
+class _StreamDecompressor(object):
+    """
+    Decompresses concatenated streams like `xz -d` does. A
+    new decompressor is started for each stream and null
+    bytes of stream padding between and after the streams
+    are skipped
+
+    Args:
+        factory(callable): creates a decompressor object for a
+            single stream like `lzma.LZMADecompressor`
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.decompressor = factory()
+
+    @property
+    def eof(self):
+        """ `True` if the last stream has been decompressed completely """
+        return self.decompressor.eof
+
+    def decompress(self, data):
+        """
+        Decompresses data and returns the decompressed bytes
+
+        Args:
+            data(bytes): compressed data
+        """
+        parts = []
+        while data:
+            if self.decompressor.eof:
+                # stream padding or the next stream
+                data = data.lstrip(b'\0')
+                if not data:
+                    break
+                self.decompressor = self.factory()
+            parts.append(self.decompressor.decompress(data))
+            data = self.decompressor.unused_data
+        return b''.join(parts)
+
+
+class _DecompressingWriter(object):
+    """
+    Decompresses data and writes it to a file in a background
+    thread. Python's decompressors release the GIL, so this
+    overlaps decompression with receiving the next chunks
+
+    Args:
+        dst(file): the destination file
+
+        decompressor(callable): a factory for decompressor objects
+            like `lzma.LZMADecompressor`. A new decompressor is started
+            for every concatenated stream
+    """
+
+    def __init__(self, dst, decompressor, maxchunks=16):
+        self.dst = dst
+        self.decompressor = _StreamDecompressor(decompressor)
+        self.queue = Queue(maxchunks)
+        self.error = None
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def write(self, data):
+        """
+        Queues data for decompression
+
+        Args:
+            data(bytearray): compressed data
+        """
+        if self.error is not None:
+            raise self.error
+        self.queue.put(data)
+
+    def finish(self):
+        """
+        Waits until all queued data has been written. Raises
+        an error if the decompression failed or if the last
+        compressed stream is incomplete
+        """
+        self.cancel()
+        if self.error is not None:
+            raise self.error
+        if not self.decompressor.eof:
+            raise EOFError(
+                'Compressed file ended before the end-of-stream marker was reached')
+
+    def cancel(self):
+        """ Stops the background thread after the queued data """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def _run(self):
+        # pylint: disable=broad-except
+        try:
+            for data in iter(self.queue.get, None):
+                self.dst.write(bytearray(self.decompressor.decompress(data)))
+        except Exception as err:
+            self.error = err
+            # keep consuming so that the receiving side never blocks
+            for _ in iter(self.queue.get, None):
+                pass
+
 def fileSplitter(inputFilename, defaultSize = 40000000):
     outputFiles = []
     chunkSize = defaultSize
@@ -56,6 +56,7 @@ class Settings(object):
         self.updmode = int(addon.getSetting('updmode'))
         self.caching = addon.getSetting('caching') == 'true'
         self.updinterval = int(float(addon.getSetting('updinterval'))) * 3600
+        self.updxzthreads = int(float(addon.getSetting('updxzthreads')))
         # download
         self.downloadpathep = mvutils.py2_decode(addon.getSetting('downloadpathep'))
         #TODO self.downloadpathep = unicode(self.downloadpathep, 'utf-8')
@@ -340,10 +340,12 @@ class Store(object):
         Inserts a film emtry into the database
 
         Args:
-            film(Film): a film entry
+            film(Film): a film entry or `None` if only the
+                already queued films should be processed
 
-            commit(bool, optional): the operation will be
-                commited immediately. Default is `True`
+            commit(bool, optional): queued films will be inserted
+                and the operation will be commited immediately.
+                Default is `True`
         """
         if self.database is not None:
             return self.database.ft_insert_film(film, commit)
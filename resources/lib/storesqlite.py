@@ -26,6 +26,13 @@ from resources.lib.exceptions import DatabaseCorrupted
 DATABASE_URL = 'https://liste.mediathekview.de/filmliste-v2.db.xz'
 DATABASE_AKT = 'filmliste-v2.db.update'
 
+# indexes not needed while importing. They are dropped during full
+# updates and rebuilt in one pass when the import is finished
+FT_DEFERRED_INDEXES = [
+    ('index_1', 'CREATE INDEX IF NOT EXISTS "index_1" ON film ("channelid", "title" COLLATE NOCASE)'),
+    ('index_2', 'CREATE INDEX IF NOT EXISTS "index_2" ON film ("showid", "title" COLLATE NOCASE)'),
+]
+
 
 class StoreSQLite(object):
     """
@@ -59,6 +66,32 @@ class StoreSQLite(object):
         self.ft_channelid = None
         self.ft_show = None
         self.ft_showid = None
+        self.ft_cache_size = None
+        self.ft_channels = {}
+        self.ft_shows = {}
+        self.films_to_insert = []
+        self.sql_films_insert = """
+            INSERT INTO `film` (
+                `idhash`,
+                `dtCreated`,
+                `channelid`,
+                `showid`,
+                `title`,
+                `search`,
+                `aired`,
+                `duration`,
+                `size`,
+                `description`,
+                `website`,
+                `url_sub`,
+                `url_video`,
+                `url_video_sd`,
+                `url_video_hd`
+            )
+            VALUES (
+                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+            )
+        """
 
     def init(self, reset=False, convert=False, failedCount = 0):
         """
@@ -96,15 +129,15 @@ class StoreSQLite(object):
             self.exit()
             mvutils.file_remove(self.dbfile)
             if self._handle_update_substitution():
-                self.conn = sqlite3.connect(self.dbfile, timeout=60)
+                self.conn = sqlite3.connect(self.dbfile, timeout=60, cached_statements=256)
             else:
-                self.conn = sqlite3.connect(self.dbfile, timeout=60)
+                self.conn = sqlite3.connect(self.dbfile, timeout=60, cached_statements=256)
                 self._handle_database_initialization()
         else:
             try:
                 if self._handle_update_substitution():
                     self._handle_not_update_to_date_dbfile()
-                self.conn = sqlite3.connect(self.dbfile, timeout=60)
+                self.conn = sqlite3.connect(self.dbfile, timeout=60, cached_statements=256)
             except sqlite3.DatabaseError as err:
                 self.logger.error(
                     'Error while opening database: {}. trying to fully reset the Database...', err)
@@ -847,11 +880,16 @@ class StoreSQLite(object):
             )
             retval = cursor.rowcount > 0
             self.conn.commit()
+            if retval:
+                # restore indexes possibly lost by an interrupted update
+                self._ft_create_deferred_indexes(cursor)
+                self.conn.commit()
             cursor.close()
             self.ft_channel = None
             self.ft_channelid = None
             self.ft_show = None
             self.ft_showid = None
+            self.films_to_insert = []
             return retval
         except sqlite3.DatabaseError as err:
             self._handle_database_corruption(err)
@@ -867,6 +905,12 @@ class StoreSQLite(object):
         """
         try:
             cursor = self.conn.cursor()
+            # keep temporary b-trees in memory and use a bigger page
+            # cache (64MB) for the duration of the import
+            cursor.execute('PRAGMA cache_size')
+            (self.ft_cache_size, ) = cursor.fetchone()
+            cursor.execute('PRAGMA temp_store = MEMORY')
+            cursor.execute('PRAGMA cache_size = -65536')
             if full:
                 cursor.executescript("""
                     UPDATE  `channel`
@@ -878,6 +922,22 @@ class StoreSQLite(object):
                     UPDATE  `film`
                     SET     `touched` = 0;
                 """)
+                # a full update touches every film. Maintaining the search
+                # indexes row by row is much slower than rebuilding them
+                for (name, _) in FT_DEFERRED_INDEXES:
+                    cursor.execute('DROP INDEX IF EXISTS "{}"'.format(name))
+            # load all channels and shows in order to avoid
+            # a lookup query for every change during the import
+            self.ft_channels = {}
+            cursor.execute(
+                'SELECT `id`,`touched`,`channel` FROM `channel` ORDER BY `id`')
+            for (channelid, touched, channel) in cursor.fetchall():
+                self.ft_channels.setdefault(channel, [channelid, touched])
+            self.ft_shows = {}
+            cursor.execute(
+                'SELECT `id`,`touched`,`channelid`,`show` FROM `show` ORDER BY `id`')
+            for (showid, touched, channelid, show) in cursor.fetchall():
+                self.ft_shows.setdefault((channelid, show), [showid, touched])
             cursor.execute('SELECT COUNT(*) FROM `channel`')
             result1 = cursor.fetchone()
             cursor.execute('SELECT COUNT(*) FROM `show`')
@@ -900,8 +960,15 @@ class StoreSQLite(object):
             delete(bool): if `True` all records not updated
                 will be deleted
         """
+        # Close the batch update
+        if self.films_to_insert:
+            self.ft_insert_film(None, True)
+
         try:
             cursor = self.conn.cursor()
+            # rebuild indexes dropped by `ft_update_start()`. They are
+            # needed by the delete statement below
+            self._ft_create_deferred_indexes(cursor)
             cursor.execute(
                 'SELECT COUNT(*) FROM `channel` WHERE ( touched = 0 )')
             (del_chn, ) = cursor.fetchone()
@@ -923,6 +990,12 @@ class StoreSQLite(object):
             (cnt_shw, ) = cursor.fetchone()
             cursor.execute('SELECT COUNT(*) FROM `film`')
             (cnt_mov, ) = cursor.fetchone()
+            self.ft_channels = {}
+            self.ft_shows = {}
+            if self.ft_cache_size is not None:
+                cursor.execute(
+                    'PRAGMA cache_size = {}'.format(int(self.ft_cache_size)))
+                self.ft_cache_size = None
             cursor.close()
             self.conn.commit()
             return (del_chn, del_shw, del_mov, cnt_chn, cnt_shw, cnt_mov, )
@@ -938,166 +1011,154 @@ class StoreSQLite(object):
         Args:
             film(Film): a film entry
 
-            commit(bool, optional): the operation will be
-                commited immediately. Default is `True`
+            commit(bool, optional): If true, collected films in
+                `self.films_to_insert` are bulk-inserted into the
+                database and the operation is commited.
+                Default is `True`
         """
         try:
             cursor = self.conn.cursor()
-            newchn = False
             inschn = 0
             insshw = 0
             insmov = 0
-            channel = film['channel'][:64]
-            show = film['show'][:128]
-            title = film['title'][:128]
-
-            # handle channel
-            if self.ft_channel != channel:
-                # process changed channel
-                newchn = True
-                cursor.execute(
-                    'SELECT `id`,`touched` FROM `channel` WHERE channel.channel=?', (channel, ))
-                result = cursor.fetchall()
-                if result:
-                    # get the channel data
-                    self.ft_channel = channel
-                    self.ft_channelid = result[0][0]
-                    if result[0][1] == 0:
+
+            if film is not None:
+                newchn = False
+                channel = film['channel'][:64]
+                show = film['show'][:128]
+                title = film['title'][:128]
+
+                # handle channel
+                if self.ft_channel != channel:
+                    # process changed channel
+                    newchn = True
+                    entry = self.ft_channels.get(channel)
+                    if entry is None:
+                        # insert the new channel
+                        inschn = 1
+                        cursor.execute('INSERT INTO `channel` ( `dtCreated`,`channel` ) VALUES ( ?,? )', (int(
+                            time.time()), channel))
+                        entry = [cursor.lastrowid, 1]
+                        self.ft_channels[channel] = entry
+                    elif entry[1] == 0:
                         # updated touched
                         cursor.execute(
-                            'UPDATE `channel` SET `touched`=1 WHERE ( channel.id=? )', (self.ft_channelid, ))
-                else:
-                    # insert the new channel
-                    inschn = 1
-                    cursor.execute('INSERT INTO `channel` ( `dtCreated`,`channel` ) VALUES ( ?,? )', (int(
-                        time.time()), channel))
+                            'UPDATE `channel` SET `touched`=1 WHERE ( channel.id=? )', (entry[0], ))
+                        entry[1] = 1
                     self.ft_channel = channel
-                    self.ft_channelid = cursor.lastrowid
-
-            # handle show
-            if newchn or self.ft_show != show:
-                # process changed show
-                cursor.execute(
-                    'SELECT `id`,`touched` FROM `show` WHERE ( show.channelid=? ) AND ( show.show=? )', (self.ft_channelid, show))
-                result = cursor.fetchall()
-                if result:
-                    # get the show data
-                    self.ft_show = show
-                    self.ft_showid = result[0][0]
-                    if result[0][1] == 0:
-                        # updated touched
+                    self.ft_channelid = entry[0]
+
+                # handle show
+                if newchn or self.ft_show != show:
+                    # process changed show
+                    entry = self.ft_shows.get((self.ft_channelid, show))
+                    if entry is not None:
+                        if entry[1] == 0:
+                            # updated touched
+                            cursor.execute(
+                                'UPDATE `show` SET `touched`=1 WHERE ( show.id=? )', (entry[0], ))
+                            entry[1] = 1
+                        self.ft_show = show
+                        self.ft_showid = entry[0]
+                    else:
+                        # insert the new show
+                        insshw = 1
                         cursor.execute(
-                            'UPDATE `show` SET `touched`=1 WHERE ( show.id=? )', (self.ft_showid, ))
-                else:
-                    # insert the new show
-                    insshw = 1
-                    cursor.execute(
-                        """
-                        INSERT INTO `show` (
-                            `dtCreated`,
-                            `channelid`,
-                            `show`,
-                            `search`
-                        )
-                        VALUES (
-                            ?,
-                            ?,
-                            ?,
-                            ?
+                            """
+                            INSERT INTO `show` (
+                                `dtCreated`,
+                                `channelid`,
+                                `show`,
+                                `search`
+                            )
+                            VALUES (
+                                ?,
+                                ?,
+                                ?,
+                                ?
+                            )
+                            """, (
+                                int(time.time()),
+                                self.ft_channelid, show,
+                                mvutils.make_search_string(show)
+                            )
                         )
-                        """, (
-                            int(time.time()),
-                            self.ft_channelid, show,
-                            mvutils.make_search_string(show)
-                        )
-                    )
-                    self.ft_show = show
-                    self.ft_showid = cursor.lastrowid
-
-            # check if the movie is there
-            checkString = "{}:{}:{}".format(self.ft_channelid, self.ft_showid, film['url_video'])
-            idhash = hashlib.md5(checkString.encode('utf-8')).hexdigest()
-            cursor.execute("""
-                SELECT      `id`,
-                            `touched`
-                FROM        `film`
-                WHERE       ( film.idhash = ? )
-            """, (idhash, ))
-            result = cursor.fetchall()
-            if result:
-                # film found
-                filmid = result[0][0]
-                if result[0][1] == 0:
-                    # update touched
-                    cursor.execute(
-                        'UPDATE `film` SET `touched`=1 WHERE ( film.id=? )', (filmid, ))
-            else:
-                # insert the new film
-                insmov = 1
-                cursor.execute(
-                    """
-                    INSERT INTO `film` (
-                        `idhash`,
-                        `dtCreated`,
-                        `channelid`,
-                        `showid`,
-                        `title`,
-                        `search`,
-                        `aired`,
-                        `duration`,
-                        `size`,
-                        `description`,
-                        `website`,
-                        `url_sub`,
-                        `url_video`,
-                        `url_video_sd`,
-                        `url_video_hd`
-                    )
-                    VALUES (
-                        ?,
-                        ?,
-                        ?,
-                        ?,
-                        ?,
-                        ?,
-                        ?,
-                        ?,
-                        ?,
-                        ?,
-                        ?,
-                        ?,
-                        ?,
-                        ?,
-                        ?
-                    )
-                    """, (
-                        idhash,
-                        int(time.time()),
-                        self.ft_channelid,
-                        self.ft_showid,
-                        title,
-                        mvutils.make_search_string(film['title']),
-                        film['airedepoch'],
-                        mvutils.make_duration(film['duration']),
-                        film['size'],
-                        film['description'],
-                        film['website'],
-                        film['url_sub'],
-                        film['url_video'],
-                        film['url_video_sd'],
-                        film['url_video_hd']
-                    )
-                )
-                filmid = cursor.lastrowid
+                        self.ft_show = show
+                        self.ft_showid = cursor.lastrowid
+                        self.ft_shows[(self.ft_channelid, show)] = [
+                            self.ft_showid, 1]
+
+                # queue the movie. It will be checked and inserted on commit
+                checkString = "{}:{}:{}".format(self.ft_channelid, self.ft_showid, film['url_video'])
+                self.films_to_insert.append((
+                    hashlib.md5(checkString.encode('utf-8')).hexdigest(),
+                    int(time.time()),
+                    self.ft_channelid,
+                    self.ft_showid,
+                    title,
+                    mvutils.make_search_string(film['title']),
+                    film['airedepoch'],
+                    mvutils.make_duration(film['duration']),
+                    film['size'],
+                    film['description'],
+                    film['website'],
+                    film['url_sub'],
+                    film['url_video'],
+                    film['url_video_sd'],
+                    film['url_video_hd']
+                ))
+
             if commit:
+                if self.films_to_insert:
+                    insmov = self._ft_insert_films(cursor)
                 self.conn.commit()
             cursor.close()
-            return (filmid, inschn, insshw, insmov)
+            return (0, inschn, insshw, insmov)
         except sqlite3.DatabaseError as err:
+            self.films_to_insert = []
             self._handle_database_corruption(err)
             raise DatabaseCorrupted(
                 'Database error during critical operation: {} - Database will be rebuilt from scratch.'.format(err))
 
+    def _ft_insert_films(self, cursor):
+        films = self.films_to_insert
+        self.films_to_insert = []
+        # check which of the movies are already there
+        known = {}
+        for pos in range(0, len(films), 500):
+            idhashes = [film[0] for film in films[pos:pos + 500]]
+            cursor.execute(
+                'SELECT `idhash`,`id`,`touched` FROM `film` WHERE ( film.idhash IN ( {} ) ) ORDER BY `id`'.format(
+                    ','.join('?' * len(idhashes))
+                ),
+                idhashes
+            )
+            for (idhash, filmid, touched) in cursor.fetchall():
+                known.setdefault(idhash, (filmid, touched, ))
+        touch = []
+        insert = []
+        for film in films:
+            entry = known.get(film[0])
+            if entry is None:
+                # new film. ignore duplicates within the batch
+                insert.append(film)
+                known[film[0]] = (None, 1, )
+            elif entry[1] == 0:
+                # film found - update touched
+                touch.append((entry[0], ))
+                known[film[0]] = (entry[0], 1, )
+        if touch:
+            cursor.executemany(
+                'UPDATE `film` SET `touched`=1 WHERE ( film.id=? )', touch)
+        if insert:
+            cursor.executemany(self.sql_films_insert, insert)
+        return len(insert)
+
+    @staticmethod
+    def _ft_create_deferred_indexes(cursor):
+        for (_, statement) in FT_DEFERRED_INDEXES:
+            cursor.execute(statement)
+
     def _load_cache(self, reqtype, condition):
         filename = os.path.join(self.settings.datapath, reqtype + '.cache')
         dbLastUpdate = self.get_status()['modified']
@@ -1161,7 +1222,7 @@ class StoreSQLite(object):
         ###
         try:
             if self.conn is None:
-                self.conn = sqlite3.connect(self.dbfile, timeout=60)
+                self.conn = sqlite3.connect(self.dbfile, timeout=60, cached_statements=256)
             cursor = self.conn.cursor()
             cursor.execute('SELECT modified FROM `status` LIMIT 1')
             rs = cursor.fetchall()
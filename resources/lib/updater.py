@@ -18,9 +18,20 @@ import resources.lib.updateFileParser as UpdateFileParser
 try:
     # Python 3.x
     from urllib.error import URLError
+    from time import monotonic
 except ImportError:
     # Python 2.x
     from urllib2 import URLError
+    from time import time as monotonic
+
+try:
+    # Python 3.x
+    from sys import intern
+except ImportError:
+    # Python 2.x: the builtin intern() does not accept unicode strings
+    def intern(val):
+        """ Returns the string unchanged """
+        return val
 
 from contextlib import closing
 from codecs import open
@@ -36,9 +47,16 @@ from resources.lib.exceptions import DatabaseLost
 from resources.lib.exceptions import ExitRequested
 
 # -- Unpacker support ---------------------------------------
+UPD_CAN_XZ = False
 UPD_CAN_BZ2 = False
 UPD_CAN_GZ = False
 
+try:
+    import lzma
+    UPD_CAN_XZ = True
+except ImportError:
+    pass
+
 try:
     import bz2
     UPD_CAN_BZ2 = True
@@ -56,6 +74,8 @@ FILMLISTE_URL = 'https://liste.mediathekview.de/'
 FILMLISTE_AKT = 'Filmliste-akt'
 FILMLISTE_DIF = 'Filmliste-diff'
 
+JSON_DECODER = json.JSONDecoder()
+
 # -- Classes ------------------------------------------------
 # pylint: disable=bad-whitespace
 
@@ -69,7 +89,7 @@ class MediathekViewUpdater(object):
         self.settings = settings
         self.monitor = monitor
         self.database = None
-        self.use_xz = mvutils.find_xz() is not None
+        self.use_xz = UPD_CAN_XZ or mvutils.find_xz() is not None
         self.cycle = 0
         self.add_chn = 0
         self.add_shw = 0
@@ -80,9 +100,9 @@ class MediathekViewUpdater(object):
         self.tot_chn = 0
         self.tot_shw = 0
         self.tot_mov = 0
-        self.index = 0
         self.count = 0
         self.film = {}
+        self.last_progress = 0.0
 
     def init(self, convert=False):
         """ Initializes the updater """
@@ -240,8 +260,6 @@ class MediathekViewUpdater(object):
             flts = 0
             ####
             flsm = 0
-            sender = ""
-            thema = ""
             self.notifier.show_update_progress()
             (self.tot_chn, self.tot_shw, self.tot_mov) = self._update_start(full)
             
@@ -253,31 +271,31 @@ class MediathekViewUpdater(object):
             ## {"Filmliste":["30.08.2020, 11:13","30.08.2020, 09:13","3","MSearch [Vers.: 3.1.139]","d93c9794acaf3e482d42c24e513f78a8"],"Filmliste":["Sender","Thema","Titel","Datum","Zeit","Dauer","Größe [MB]","Beschreibung","Url","Website","Url Untertitel","Url RTMP","Url Klein","Url RTMP Klein","Url HD","Url RTMP HD","DatumL","Url History","Geo","neu"]
             # this is the timestamp of this database update
             #value = jsonDoc['Filmliste'][0]
-            value = fileHeader[15:32]
+            value = fileHeader[15:32].strip()
             #self.logger.info( 'update date ' + value )
             try:
                 fldt = datetime.datetime.strptime(
-                    value.strip(), "%d.%m.%Y, %H:%M")
+                    value, "%d.%m.%Y, %H:%M")
                 flts = int(time.mktime(fldt.timetuple()))
                 self.database.update_status(filmupdate=flts)
                 self.logger.info(
-                    'Filmliste dated {}', value.strip())
+                    'Filmliste dated {}', value)
             except TypeError:
                 # pylint: disable=line-too-long
                 # SEE: https://forum.kodi.tv/showthread.php?tid=112916&pid=1214507#pid1214507
                 # Wonderful. His name is also Leopold
                 try:
                     flts = int(time.mktime(time.strptime(
-                        value.strip(), "%d.%m.%Y, %H:%M")))
+                        value, "%d.%m.%Y, %H:%M")))
                     self.database.update_status(
                         filmupdate=flts)
                     self.logger.info(
-                        'Filmliste dated {}', value.strip())
+                        'Filmliste dated {}', value)
                     # pylint: disable=broad-except
                 except Exception as err:
                     # If the universe hates us...
                     self.logger.debug(
-                        'Could not determine date "{}" of filmliste: {}', value.strip(), err)
+                        'Could not determine date "{}" of filmliste: {}', value, err)
             except ValueError as err:
                 pass            
 
@@ -286,26 +304,10 @@ class MediathekViewUpdater(object):
                 aPart = ufp.next(',"X":');
                 if (len(aPart) == 0):
                     break;
-                ##
-                aPart = '{"X":' + aPart;
-                if (not(aPart.endswith("}"))):
-                    aPart = aPart + "}";
-                ##
-                jsonDoc = json.loads(aPart)
-                jsonDoc = jsonDoc['X']
-                self._init_record()
-                # behaviour of the update list
-                if (len(jsonDoc[0]) > 0):
-                    sender = jsonDoc[0]
-                else:
-                    jsonDoc[0] = sender
-                # same for thema
-                if (len(jsonDoc[1]) > 0):
-                    thema = jsonDoc[1]
-                else:
-                    jsonDoc[1] = thema
-                ##
-                self._add_value( jsonDoc )
+                # decode the record array in place. Trailing data
+                # like the closing brace of the document is ignored
+                jsonDoc = JSON_DECODER.raw_decode(aPart, aPart.find('['))[0]
+                self._add_value(jsonDoc)
                 self._end_record(records)
                 if self.count % 100 == 0 and self.monitor.abort_requested():
                     # kodi is shutting down. Close all
@@ -362,6 +364,7 @@ class MediathekViewUpdater(object):
         mvutils.file_remove(destfile)
 
         # download filmliste
+        stream_xz = self._use_xz_stream()
         self.notifier.show_download_progress()
 
         # pylint: disable=broad-except
@@ -369,12 +372,22 @@ class MediathekViewUpdater(object):
             self.logger.info('Trying to download {} from {}...',
                              os.path.basename(compfile), url)
             self.notifier.update_download_progress(0, url)
-            mvutils.url_retrieve(
-                url,
-                filename=compfile,
-                reporthook=self.notifier.hook_download_progress,
-                aborthook=self.monitor.abort_requested
-            )
+            if stream_xz:
+                # download and decompress in one pass
+                mvutils.url_retrieve(
+                    url,
+                    filename=destfile,
+                    reporthook=self._reporthook,
+                    aborthook=self.monitor.abort_requested,
+                    decompressor=lzma.LZMADecompressor
+                )
+            else:
+                mvutils.url_retrieve(
+                    url,
+                    filename=compfile,
+                    reporthook=self._reporthook,
+                    aborthook=self.monitor.abort_requested
+                )
         except URLError as err:
             self.logger.error('Failure downloading {} - {}', url, err)
             self.notifier.close_download_progress()
@@ -393,9 +406,12 @@ class MediathekViewUpdater(object):
             return False
 
         # decompress filmliste
-        if self.use_xz is True:
+        if stream_xz:
+            # already decompressed during download
+            retval = 0
+        elif self.use_xz is True:
             self.logger.info('Trying to decompress xz file...')
-            retval = subprocess.call([mvutils.find_xz(), '-d', compfile])
+            retval = self._decompress_xz(compfile)
             self.logger.info('Return {}', retval)
         elif UPD_CAN_BZ2 is True:
             self.logger.info('Trying to decompress bz2 file...')
@@ -477,7 +493,6 @@ class MediathekViewUpdater(object):
         self.del_chn = 0
         self.del_shw = 0
         self.del_mov = 0
-        self.index = 0
         self.count = 0
         self.film = {
             "channel": "",
@@ -498,6 +513,9 @@ class MediathekViewUpdater(object):
         return self.database.ft_update_start(full)
 
     def _update_end(self, full, status):
+        # insert the films still queued by the database driver
+        (_, _, _, cnt_mov) = self.database.ft_insert_film(None, True)
+        self.add_mov += cnt_mov
         self.logger.info('Added: channels:%d, shows:%d, movies:%d ...' % (
             self.add_chn, self.add_shw, self.add_mov))
         (self.del_chn, self.del_shw, self.del_mov, self.tot_chn, self.tot_shw,
@@ -516,23 +534,9 @@ class MediathekViewUpdater(object):
             self.tot_chn, self.tot_shw, self.tot_mov
         )
 
-    def _init_record(self):
-        self.index = 0
-        self.film["title"] = ""
-        self.film["aired"] = "1980-01-01 00:00:00"
-        self.film["duration"] = "00:00:00"
-        self.film["size"] = 0
-        self.film["description"] = ""
-        self.film["website"] = ""
-        self.film["url_sub"] = ""
-        self.film["url_video"] = ""
-        self.film["url_video_sd"] = ""
-        self.film["url_video_hd"] = ""
-        self.film["airedepoch"] = 0
-        self.film["geo"] = ""
-
     def _end_record(self, records):
-        if self.count % 1000 == 0:
+        commit = self.count % 1000 == 0
+        if commit and self._is_progress_due():
             # pylint: disable=line-too-long
             percent = int(self.count * 100 / records)
             self.logger.info('In progress (%d%%): channels:%d, shows:%d, movies:%d ...' % (
@@ -547,53 +551,85 @@ class MediathekViewUpdater(object):
                 tot_shw=self.tot_shw + self.add_shw,
                 tot_mov=self.tot_mov + self.add_mov
             )
-            self.count = self.count + 1
-            (_, cnt_chn, cnt_shw, cnt_mov) = self.database.ft_insert_film(
-                self.film,
-                True
-            )
-        else:
-            self.count = self.count + 1
-            (_, cnt_chn, cnt_shw, cnt_mov) = self.database.ft_insert_film(
-                self.film,
-                False
-            )
+        self.count = self.count + 1
+        (_, cnt_chn, cnt_shw, cnt_mov) = self.database.ft_insert_film(
+            self.film,
+            commit
+        )
         self.add_chn += cnt_chn
         self.add_shw += cnt_shw
         self.add_mov += cnt_mov
 
+    def _reporthook(self, blockcount, blocksize, totalsize):
+        if self._is_progress_due():
+            self.notifier.hook_download_progress(
+                blockcount, blocksize, totalsize)
+
+    def _is_progress_due(self):
+        # limit UI progress updates to 10 per second
+        now = monotonic()
+        if now - self.last_progress < 0.1:
+            return False
+        self.last_progress = now
+        return True
+
     def _add_value(self, valueArray):
-        self.film["channel"] = valueArray[0]
-        self.film["show"] = valueArray[1][:255]
-        self.film["title"] = valueArray[2][:255]
-        ##
-        if len(valueArray[3]) == 10:
-            self.film["aired"] = valueArray[3][6:] + '-' + valueArray[3][3:5] + '-' + valueArray[3][:2]  
-            if (len(valueArray[4]) == 8):
-                self.film["aired"] = self.film["aired"] + " " + valueArray[4]
-        ##
-        if len(valueArray[5]) > 0:
-            self.film["duration"] = valueArray[5]
-        if len(valueArray[6]) > 0:
-            self.film["size"] = int(valueArray[6])
-        if len(valueArray[7]) > 0:
-            self.film["description"] = valueArray[7]
-        self.film["url_video"] = valueArray[8]
-        self.film["website"] = valueArray[9]
-        self.film["url_sub"] = valueArray[10]    
-        self.film["url_video_sd"] = self._make_url(valueArray[12])
-        self.film["url_video_hd"] = self._make_url(valueArray[14])
-        if len(valueArray[16]) > 0:
-            self.film["airedepoch"] = int(valueArray[16])
-        self.film["geo"] = valueArray[18]
-        
-    def _make_url(self, val):
-        parts = val.split('|')
-        if len(parts) == 2:
-            cnt = int(parts[0])
-            return self.film["url_video"][:cnt] + parts[1]
-        else:
-            return val
+        aired = "1980-01-01 00:00:00"
+        airdate = valueArray[3]
+        if len(airdate) == 10:
+            # dd.mm.yyyy [hh:mm:ss] => yyyy-mm-dd [hh:mm:ss]
+            if len(valueArray[4]) == 8:
+                aired = '%s-%s-%s %s' % (airdate[6:], airdate[3:5], airdate[:2], valueArray[4])
+            else:
+                aired = '%s-%s-%s' % (airdate[6:], airdate[3:5], airdate[:2])
+        url_video = valueArray[8]
+        self.film = {
+            # empty channel or show means: same as in the previous record.
+            # names are interned since they repeat over the whole list
+            "channel": intern(valueArray[0]) if valueArray[0] else self.film["channel"],
+            "show": intern(valueArray[1][:255]) if valueArray[1] else self.film["show"],
+            "title": valueArray[2][:255],
+            "aired": aired,
+            "duration": valueArray[5] or "00:00:00",
+            "size": int(valueArray[6]) if valueArray[6] else 0,
+            "description": valueArray[7],
+            "website": valueArray[9],
+            "url_sub": valueArray[10],
+            "url_video": url_video,
+            "url_video_sd": self._make_url(valueArray[12], url_video),
+            "url_video_hd": self._make_url(valueArray[14], url_video),
+            "airedepoch": int(valueArray[16]) if valueArray[16] else 0,
+            "geo": valueArray[18]
+        }
+
+    def _make_url(self, val, url_video):
+        # "<cnt>|<suffix>": first cnt characters of url_video + suffix
+        (cnt, sep, suffix) = val.partition('|')
+        if sep and '|' not in suffix:
+            return url_video[:int(cnt)] + suffix
+        return val
+
+    def _use_xz_stream(self):
+        # the lzma module decompresses on a single core while the xz
+        # binary can use several threads. Decompress in-process while
+        # downloading only if there is no xz binary or if xz would be
+        # limited to one thread anyway
+        if UPD_CAN_XZ is not True:
+            return False
+        return self.settings.updxzthreads == 1 or mvutils.find_xz() is None
+
+    def _decompress_xz(self, sourcefile):
+        xz_binary = mvutils.find_xz()
+        retval = subprocess.call([
+            xz_binary, '-d', '-T{}'.format(self.settings.updxzthreads), sourcefile
+        ])
+        if retval != 0 and mvutils.file_exists(sourcefile):
+            # xz versions before 5.2 do not support threads
+            self.logger.info(
+                'Calling {} -d -T{} returned {}. Retrying without threads...',
+                xz_binary, self.settings.updxzthreads, retval)
+            retval = subprocess.call([xz_binary, '-d', sourcefile])
+        return retval
 
     def _decompress_bz2(self, sourcefile, destfile):
         blocksize = 8192